@@ -30,6 +30,8 @@
 #include <stdlib.h>
 #include <stdio.h>
 #include <fcntl.h>
+#include <time.h>
+#include <unistd.h>
 #include <linux/spi/spidev.h>
 #include <linux/types.h>
 #include <sys/ioctl.h>
@@ -149,6 +151,7 @@ typedef struct {
 	uint8_t bits_per_word;	/* current SPI bits per word setting */
 	uint32_t max_speed_hz;	/* current SPI max speed setting in Hz */
 	uint8_t read0;	/* read 0 bytes after transfer to lwoer CS if SPI_CS_HIGH */
+	uint32_t baud;	/* configured MAX3100 baud rate, 0 if not configured */
 } MAX3100_Object;
 
 static PyObject *
@@ -162,6 +165,7 @@ MAX3100_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
 	self->mode = 0;
 	self->bits_per_word = 0;
 	self->max_speed_hz = 0;
+	self->baud = 0;
 	
 	Py_INCREF(self);
 	return (PyObject *)self;
@@ -183,6 +187,7 @@ MAX3100_close(MAX3100_Object *self)
 	self->mode = 0;
 	self->bits_per_word = 0;
 	self->max_speed_hz = 0;
+	self->baud = 0;
 
 	Py_INCREF(Py_None);
 	return Py_None;
@@ -201,8 +206,12 @@ static char *wrmsg_list0 = "Empty argument list.";
 static char *wrmsg_listmax = "Argument list size exceeds %d bytes.";
 static char *wrmsg_val = "Non-Int/Long value in arguments: %x.";
 static char *wrmsg_oom = "Out of memory.";
+static char *wrmsg_timeout = "timeout must be a non-negative number.";
 
 
+static PyObject *
+MAX3100_writebytes2_buffer(MAX3100_Object *self, Py_buffer *buffer);
+
 PyDoc_STRVAR(MAX3100_write_doc,
 	"write([values]) -> None\n\n"
 	"Write bytes to SPI device.\n");
@@ -215,19 +224,56 @@ MAX3100_writebytes(MAX3100_Object *self, PyObject *args)
 	uint8_t	buf[SPIDEV_MAXPATH];
 	PyObject	*obj;
 	PyObject	*seq;
+	PyObject	*result;
 	char	wrmsg_text[4096];
 
 	if (!PyArg_ParseTuple(args, "O:write", &obj))
 		return NULL;
 
+	// Byte buffers (bytes, bytearray, ...) are written straight from their buffer
+	// rather than converting each element through the sequence protocol.
+	// Buffers with wider items, such as array('H'), still go element by element
+	// so that each value is truncated to one byte as before.
+	if (PyObject_CheckBuffer(obj)) {
+		Py_buffer	buffer;
+		if (PyObject_GetBuffer(obj, &buffer, PyBUF_SIMPLE) != -1) {
+			if (buffer.itemsize == 1) {
+				if (buffer.len <= 0) {
+					PyBuffer_Release(&buffer);
+					PyErr_SetString(PyExc_TypeError, wrmsg_list0);
+					return NULL;
+				}
+				if (buffer.len > SPIDEV_MAXPATH) {
+					PyBuffer_Release(&buffer);
+					snprintf(wrmsg_text, sizeof (wrmsg_text) - 1, wrmsg_listmax, SPIDEV_MAXPATH);
+					PyErr_SetString(PyExc_OverflowError, wrmsg_text);
+					return NULL;
+				}
+				result = MAX3100_writebytes2_buffer(self, &buffer);
+				PyBuffer_Release(&buffer);
+				return result;
+			}
+			PyBuffer_Release(&buffer);
+		} else {
+			PyErr_Clear();
+		}
+	}
+
 	seq = PySequence_Fast(obj, "expected a sequence");
+	if (!seq) {
+		PyErr_SetString(PyExc_TypeError, wrmsg_list0);
+		return NULL;
+	}
+
 	len = PySequence_Fast_GET_SIZE(seq);
-	if (!seq || len <= 0) {
+	if (len <= 0) {
+		Py_DECREF(seq);
 		PyErr_SetString(PyExc_TypeError, wrmsg_list0);
 		return NULL;
 	}
 
 	if (len > SPIDEV_MAXPATH) {
+		Py_DECREF(seq);
 		snprintf(wrmsg_text, sizeof (wrmsg_text) - 1, wrmsg_listmax, SPIDEV_MAXPATH);
 		PyErr_SetString(PyExc_OverflowError, wrmsg_text);
 		return NULL;
@@ -246,6 +292,7 @@ MAX3100_writebytes(MAX3100_Object *self, PyObject *args)
 			} else {
 				snprintf(wrmsg_text, sizeof (wrmsg_text) - 1, wrmsg_val, val);
 				PyErr_SetString(PyExc_TypeError, wrmsg_text);
+				Py_DECREF(seq);
 				return NULL;
 			}
 		}
@@ -253,7 +300,9 @@ MAX3100_writebytes(MAX3100_Object *self, PyObject *args)
 
 	Py_DECREF(seq);
 
+	Py_BEGIN_ALLOW_THREADS
 	status = write(self->fd, &buf[0], len);
+	Py_END_ALLOW_THREADS
 
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
@@ -270,7 +319,7 @@ MAX3100_writebytes(MAX3100_Object *self, PyObject *args)
 }
 
 PyDoc_STRVAR(MAX3100_read_doc,
-	"read(len) -> [values]\n\n"
+	"readbytes(len) -> [values]\n\n"
 	"Read len bytes from SPI device.\n");
 
 static PyObject *
@@ -289,8 +338,9 @@ MAX3100_readbytes(MAX3100_Object *self, PyObject *args)
 	else if ((unsigned)len > sizeof(rxbuf))
 		len = sizeof(rxbuf);
 
-	memset(rxbuf, 0, sizeof rxbuf);
+	Py_BEGIN_ALLOW_THREADS
 	status = read(self->fd, &rxbuf[0], len);
+	Py_END_ALLOW_THREADS
 
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
@@ -312,6 +362,208 @@ MAX3100_readbytes(MAX3100_Object *self, PyObject *args)
 	return list;
 }
 
+// Number of 16-bit MAX3100 read commands sent per SPI_IOC_MESSAGE ioctl in read().
+// SPI_IOC_MESSAGE(N) cannot describe more than 511 transfers, so stay well below that.
+#define MAX3100_READ_BLOCK 256
+// Read data command as sent on the wire, MSB first. Shared by every transfer in read().
+static const uint8_t max3100_read_data_cmd[2] = {
+	(MAX3100_CMD_READ_DATA >> 8) & 0xFF,
+	MAX3100_CMD_READ_DATA & 0xFF,
+};
+
+// While read() waits for data it polls the empty receive FIFO every
+// MAX3100_POLL_CHARS character times, well before the MAX3100_FIFO_DEPTH
+// words the FIFO holds can fill up and overflow.
+#define MAX3100_FIFO_DEPTH 8
+#define MAX3100_POLL_CHARS 4
+#if MAX3100_POLL_CHARS >= MAX3100_FIFO_DEPTH
+#error "read() must poll the receive FIFO before it can overflow"
+#endif
+// Bits per character on the wire: start, 8 data and stop bits.
+#define MAX3100_CHAR_BITS 10
+// Poll interval used when the baud rate is unknown (open() not called).
+#define MAX3100_POLL_USECS 1000
+
+static double
+monotonic_time(void)
+{
+	struct timespec ts;
+
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+	return ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+// Interval in microseconds between polls of an empty receive FIFO.
+static useconds_t
+MAX3100_poll_usecs(MAX3100_Object *self)
+{
+	if (self->baud == 0)
+		return MAX3100_POLL_USECS;
+	return (uint64_t)MAX3100_POLL_CHARS * MAX3100_CHAR_BITS * 1000000 / self->baud;
+}
+
+// Fill out with up to len bytes received by the MAX3100, waiting up to timeout
+// seconds for the receive FIFO to refill. Returns the number of bytes stored,
+// or -1 with an exception set.
+static Py_ssize_t
+MAX3100_read_internal(MAX3100_Object *self, char *out, Py_ssize_t len, double timeout)
+{
+	int		status, block_size, ii;
+	double	deadline, now;
+	useconds_t	poll_usecs = MAX3100_poll_usecs(self), sleep_usecs;
+	Py_ssize_t	count, remain;
+	uint16_t	word = 0;
+	uint8_t	rxbuf[2 * MAX3100_READ_BLOCK];
+	struct spi_ioc_transfer xfer[MAX3100_READ_BLOCK];
+
+	deadline = monotonic_time() + timeout;
+
+	// The transfers only differ in where they receive, so describe them once
+	// up front rather than on every pass while waiting for the FIFO to fill.
+	block_size = (len < MAX3100_READ_BLOCK) ? len : MAX3100_READ_BLOCK;
+	memset(xfer, 0, sizeof(xfer[0]) * block_size);
+	for (ii = 0; ii < block_size; ii++) {
+		xfer[ii].tx_buf = (unsigned long)max3100_read_data_cmd;
+		xfer[ii].rx_buf = (unsigned long)&rxbuf[2 * ii];
+		xfer[ii].len = 2;
+		xfer[ii].speed_hz = self->max_speed_hz;
+		xfer[ii].bits_per_word = 8;
+		// The MAX3100 needs CS toggled after every 16-bit word
+		xfer[ii].cs_change = 1;
+	}
+
+	count = 0;
+	remain = len;
+	while (remain > 0) {
+		block_size = (remain < MAX3100_READ_BLOCK) ? remain : MAX3100_READ_BLOCK;
+
+		// Leave CS released after the last word of the message
+		xfer[block_size - 1].cs_change = 0;
+
+		Py_BEGIN_ALLOW_THREADS
+		status = ioctl(self->fd, SPI_IOC_MESSAGE(block_size), xfer);
+		Py_END_ALLOW_THREADS
+
+		xfer[block_size - 1].cs_change = 1;
+
+		if (status < 0) {
+			PyErr_SetFromErrno(PyExc_IOError);
+			return -1;
+		}
+
+		for (ii = 0; ii < block_size; ii++) {
+			word = (rxbuf[2 * ii] << 8) | rxbuf[2 * ii + 1];
+			if (word & MAX3100_CONF_R)
+				out[count++] = (char)(word & 0xFF);
+		}
+
+		remain = len - count;
+
+		// The last word of the block carried no data, so the receive FIFO is empty
+		if (remain > 0 && !(word & MAX3100_CONF_R)) {
+			now = monotonic_time();
+			if (now >= deadline)
+				break;
+			// Don't sleep past the deadline
+			sleep_usecs = poll_usecs;
+			if ((deadline - now) * 1e6 < sleep_usecs)
+				sleep_usecs = (deadline - now) * 1e6 + 1;
+			Py_BEGIN_ALLOW_THREADS
+			usleep(sleep_usecs);
+			Py_END_ALLOW_THREADS
+			// Let Ctrl-C and other signal handlers interrupt the wait
+			if (PyErr_CheckSignals() < 0)
+				return -1;
+		}
+	}
+
+	return count;
+}
+
+PyDoc_STRVAR(MAX3100_read_bytes_doc,
+	"read(len, timeout=0) -> bytes\n\n"
+	"Read up to len bytes received by the MAX3100.\n"
+	"Each byte is fetched with a 16-bit read data command, and the commands\n"
+	"are batched so that many bytes are read per SPI transaction.\n"
+	"If the receive FIFO runs empty, wait up to timeout seconds for more\n"
+	"data before returning fewer than len bytes.\n");
+
+static PyObject *
+MAX3100_read(MAX3100_Object *self, PyObject *args, PyObject *kwds)
+{
+	int		len;
+	double	timeout = 0.0;
+	Py_ssize_t	count;
+	PyObject	*result;
+	static char *kwlist[] = {"len", "timeout", NULL};
+
+	if (!PyArg_ParseTupleAndKeywords(args, kwds, "i|d:read", kwlist, &len, &timeout))
+		return NULL;
+
+	if (Py_IS_NAN(timeout) || timeout < 0) {
+		PyErr_SetString(PyExc_ValueError, wrmsg_timeout);
+		return NULL;
+	}
+
+	/* read at least 1 byte, no more than SPIDEV_MAXPATH */
+	if (len < 1)
+		len = 1;
+	else if (len > SPIDEV_MAXPATH)
+		len = SPIDEV_MAXPATH;
+
+	// Read straight into the storage of the bytes object we return,
+	// rather than into a local buffer that would then have to be copied.
+	result = PyBytes_FromStringAndSize(NULL, len);
+	if (!result)
+		return NULL;
+
+	count = MAX3100_read_internal(self, PyBytes_AS_STRING(result), len, timeout);
+	if (count < 0) {
+		Py_DECREF(result);
+		return NULL;
+	}
+
+	if (count < len && _PyBytes_Resize(&result, count) < 0)
+		return NULL;
+
+	return result;
+}
+
+PyDoc_STRVAR(MAX3100_readinto_doc,
+	"readinto(buffer, timeout=0) -> int\n\n"
+	"Read bytes received by the MAX3100 into a writable buffer such as a\n"
+	"bytearray or memoryview, without allocating a new object.\n"
+	"At most 4096 bytes are read. timeout is as for read().\n"
+	"Returns the number of bytes stored.\n");
+
+static PyObject *
+MAX3100_readinto(MAX3100_Object *self, PyObject *args, PyObject *kwds)
+{
+	Py_buffer	buffer;
+	double	timeout = 0.0;
+	Py_ssize_t	len, count;
+	static char *kwlist[] = {"buffer", "timeout", NULL};
+
+	if (!PyArg_ParseTupleAndKeywords(args, kwds, "w*|d:readinto", kwlist, &buffer, &timeout))
+		return NULL;
+
+	if (Py_IS_NAN(timeout) || timeout < 0) {
+		PyBuffer_Release(&buffer);
+		PyErr_SetString(PyExc_ValueError, wrmsg_timeout);
+		return NULL;
+	}
+
+	len = (buffer.len < SPIDEV_MAXPATH) ? buffer.len : SPIDEV_MAXPATH;
+
+	count = MAX3100_read_internal(self, buffer.buf, len, timeout);
+	PyBuffer_Release(&buffer);
+
+	if (count < 0)
+		return NULL;
+
+	return PyLong_FromSsize_t(count);
+}
+
 static PyObject *
 MAX3100_writebytes2_buffer(MAX3100_Object *self, Py_buffer *buffer)
 {
@@ -575,7 +827,9 @@ MAX3100_xfer(MAX3100_Object *self, PyObject *args)
 #endif
 	}
 
+	Py_BEGIN_ALLOW_THREADS
 	status = ioctl(self->fd, SPI_IOC_MESSAGE(len), xferptr);
+	Py_END_ALLOW_THREADS
 	free(xferptr);
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
@@ -606,9 +860,16 @@ MAX3100_xfer(MAX3100_Object *self, PyObject *args)
 		}
 	}
 
+	// Tuples are immutable, so the result goes into a new tuple of the same
+	// size rather than a list that would later be copied back into a tuple.
 	if (PyTuple_Check(obj)) {
 		Py_DECREF(seq);
-		seq = PySequence_List(obj);
+		seq = PyTuple_New(len);
+		if (!seq) {
+			free(txbuf);
+			free(rxbuf);
+			return NULL;
+		}
 	}
 
 	xfer.tx_buf = (unsigned long)txbuf;
@@ -624,7 +885,9 @@ MAX3100_xfer(MAX3100_Object *self, PyObject *args)
 	xfer.rx_nbits = 0;
 #endif
 
+	Py_BEGIN_ALLOW_THREADS
 	status = ioctl(self->fd, SPI_IOC_MESSAGE(1), &xfer);
+	Py_END_ALLOW_THREADS
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
 		free(txbuf);
@@ -636,8 +899,12 @@ MAX3100_xfer(MAX3100_Object *self, PyObject *args)
 
 	for (ii = 0; ii < len; ii++) {
 		PyObject *val = PyLong_FromLong((long)rxbuf[ii]);
-		PySequence_SetItem(seq, ii, val);
-		Py_DECREF(val); // PySequence_SetItem does not steal reference, must Py_DECREF(val)
+		if (PyTuple_Check(seq)) {
+			PyTuple_SET_ITEM(seq, ii, val);  // Steals reference, no need to Py_DECREF(val)
+		} else {
+			PySequence_SetItem(seq, ii, val);
+			Py_DECREF(val); // PySequence_SetItem does not steal reference, must Py_DECREF(val)
+		}
 	}
 
 	// WA:
@@ -650,12 +917,6 @@ MAX3100_xfer(MAX3100_Object *self, PyObject *args)
 	free(txbuf);
 	free(rxbuf);
 
-	if (PyTuple_Check(obj)) {
-		PyObject *old = seq;
-		seq = PySequence_Tuple(seq);
-		Py_DECREF(old);
-	}
-
 	return seq;
 }
 
@@ -731,9 +992,16 @@ MAX3100_xfer2(MAX3100_Object *self, PyObject *args)
 		}
 	}
 
+	// Tuples are immutable, so the result goes into a new tuple of the same
+	// size rather than a list that would later be copied back into a tuple.
 	if (PyTuple_Check(obj)) {
 		Py_DECREF(seq);
-		seq = PySequence_List(obj);
+		seq = PyTuple_New(len);
+		if (!seq) {
+			free(txbuf);
+			free(rxbuf);
+			return NULL;
+		}
 	}
 
 	Py_BEGIN_ALLOW_THREADS
@@ -756,8 +1024,12 @@ MAX3100_xfer2(MAX3100_Object *self, PyObject *args)
 
 	for (ii = 0; ii < len; ii++) {
 		PyObject *val = PyLong_FromLong((long)rxbuf[ii]);
-		PySequence_SetItem(seq, ii, val);
-		Py_DECREF(val); // PySequence_SetItem does not steal reference, must Py_DECREF(val)
+		if (PyTuple_Check(seq)) {
+			PyTuple_SET_ITEM(seq, ii, val);  // Steals reference, no need to Py_DECREF(val)
+		} else {
+			PySequence_SetItem(seq, ii, val);
+			Py_DECREF(val); // PySequence_SetItem does not steal reference, must Py_DECREF(val)
+		}
 	}
 	// WA:
 	// in CS_HIGH mode CS isnt pulled to low after transfer
@@ -771,13 +1043,6 @@ MAX3100_xfer2(MAX3100_Object *self, PyObject *args)
 	free(rxbuf);
 	Py_END_ALLOW_THREADS
 
-
-	if (PyTuple_Check(obj)) {
-		PyObject *old = seq;
-		seq = PySequence_Tuple(seq);
-		Py_DECREF(old);
-	}
-
 	return seq;
 }
 
@@ -941,6 +1206,20 @@ MAX3100_fileno(MAX3100_Object *self)
 	return result;
 }
 
+// Raise IOError for the current errno and close the descriptor open() was
+// configuring, so a failed open() doesn't leave a half-configured device behind.
+static PyObject *
+MAX3100_open_failed(MAX3100_Object *self)
+{
+	int saved_errno = errno;
+
+	close(self->fd);
+	self->fd = -1;
+	errno = saved_errno;
+	PyErr_SetFromErrno(PyExc_IOError);
+	return NULL;
+}
+
 PyDoc_STRVAR(MAX3100_open_doc,
 	"open(bus, device, crystal, baud)\n\n"
 	"Connects the object to the specified SPI device.\n"
@@ -965,20 +1244,14 @@ MAX3100_open(MAX3100_Object *self, PyObject *args, PyObject *kwds)
 		PyErr_SetFromErrno(PyExc_IOError);
 		return NULL;
 	}
-	if (ioctl(self->fd, SPI_IOC_RD_MODE, &tmp8) == -1) {
-		PyErr_SetFromErrno(PyExc_IOError);
-		return NULL;
-	}
+	if (ioctl(self->fd, SPI_IOC_RD_MODE, &tmp8) == -1)
+		return MAX3100_open_failed(self);
 	self->mode = tmp8;
-	if (ioctl(self->fd, SPI_IOC_RD_BITS_PER_WORD, &tmp8) == -1) {
-		PyErr_SetFromErrno(PyExc_IOError);
-		return NULL;
-	}
+	if (ioctl(self->fd, SPI_IOC_RD_BITS_PER_WORD, &tmp8) == -1)
+		return MAX3100_open_failed(self);
 	self->bits_per_word = tmp8;
-	if (ioctl(self->fd, SPI_IOC_RD_MAX_SPEED_HZ, &tmp32) == -1) {
-		PyErr_SetFromErrno(PyExc_IOError);
-		return NULL;
-	}
+	if (ioctl(self->fd, SPI_IOC_RD_MAX_SPEED_HZ, &tmp32) == -1)
+		return MAX3100_open_failed(self);
 	self->max_speed_hz = tmp32;
 
   uint16_t conf;
@@ -995,7 +1268,7 @@ MAX3100_open(MAX3100_Object *self, PyObject *args, PyObject *kwds)
       case 2400   : conf = MAX3100_CONF_BAUD_X2_2400; break;
       case 1200   : conf = MAX3100_CONF_BAUD_X2_1200; break;
       case 600    : conf = MAX3100_CONF_BAUD_X2_600; break;
-      default     : conf = MAX3100_CONF_BAUD_X2_9600; break;
+      default     : conf = MAX3100_CONF_BAUD_X2_9600; baud = 9600; break;
     }
   }
   else
@@ -1011,13 +1284,17 @@ MAX3100_open(MAX3100_Object *self, PyObject *args, PyObject *kwds)
       case 1200   : conf = MAX3100_CONF_BAUD_X1_1200; break;
       case 600    : conf = MAX3100_CONF_BAUD_X1_600; break;
       case 300    : conf = MAX3100_CONF_BAUD_X1_300; break;
-      default     : conf = MAX3100_CONF_BAUD_X1_9600; break;
+      default     : conf = MAX3100_CONF_BAUD_X1_9600; baud = 9600; break;
     }
   }	
 
   // Do we want the MAX3100_CONF_RM? What does this mean for us?
   conf |= (MAX3100_CMD_WRITE_CONF | MAX3100_CONF_RM);
-  write(self->fd, &conf, sizeof(uint16_t));
+  // The MAX3100 expects the 16-bit word MSB first, whatever the host byte order
+  uint8_t confbuf[2] = { (conf >> 8) & 0xFF, conf & 0xFF };
+  if (write(self->fd, confbuf, sizeof(confbuf)) < 0)
+		return MAX3100_open_failed(self);
+	self->baud = baud;
 	// fprintf(stderr, "blah blah\n");
 
 	Py_INCREF(Py_None);
@@ -1092,6 +1369,10 @@ static PyMethodDef MAX3100_methods[] = {
 		MAX3100_fileno_doc},
 	{"readbytes", (PyCFunction)MAX3100_readbytes, METH_VARARGS,
 		MAX3100_read_doc},
+	{"read", (PyCFunction)MAX3100_read, METH_VARARGS | METH_KEYWORDS,
+		MAX3100_read_bytes_doc},
+	{"readinto", (PyCFunction)MAX3100_readinto, METH_VARARGS | METH_KEYWORDS,
+		MAX3100_readinto_doc},
 	{"writebytes", (PyCFunction)MAX3100_writebytes, METH_VARARGS,
 		MAX3100_write_doc},
 	{"writebytes2", (PyCFunction)MAX3100_writebytes2, METH_VARARGS,
@@ -1,14 +1,37 @@
 #!/bin/env python3
 import sys
 
-print("Test started",file=sys.stderr)
-
 import max3100
 
-ser = max3100.MAX3100()
+def main():
+    print("Test started",file=sys.stderr)
+
+    ser = max3100.MAX3100()
+
+    ser.open(0,0,2,9600)
+
+    data = ser.read(16, timeout=0.1)
+    assert isinstance(data, bytes) and len(data) <= 16
+    print("read() returned %d bytes"%len(data),file=sys.stderr)
+
+    buf = bytearray(16)
+    n = ser.readinto(buf, timeout=0.1)
+    assert 0 <= n <= len(buf)
+    print("readinto() stored %d bytes"%n,file=sys.stderr)
+
+    for timeout in (-1.0, float("nan")):
+        for call in (lambda: ser.read(1, timeout=timeout),
+                     lambda: ser.readinto(bytearray(1), timeout=timeout)):
+            try:
+                call()
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("timeout=%r was accepted"%timeout)
 
-ser.open(0,0,2,9600)
+    ser.close()
 
-ser.close()
+    print("Test finished",file=sys.stderr)
 
-print("Test finished",file=sys.stderr)
+if __name__ == "__main__":
+    main()